@@ -1,26 +1,299 @@
+import atexit
+import errno
+import io
 import os
 import sys
-import subprocess
 import shlex
-import psutil
-import platform
+import shutil
+import fnmatch
+import getpass
+import heapq
 import time
 from datetime import datetime
 import json
+import mmap
 import re
+import select
+import signal
+import threading
+from bisect import bisect_left
+from collections import ChainMap, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
+from stat import S_ISFIFO, S_ISSOCK
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Any
+
+# subprocess, platform and psutil (which itself pulls in subprocess and
+# socket) are imported where they are used, keeping them off the startup path
+if TYPE_CHECKING:
+    import subprocess
+
+# Space-separated words that shlex.split would return unchanged
+_SIMPLE_CMD_RE = re.compile(r"[^\s'\"\\]+(?: +[^\s'\"\\]+)*")
+
+# A lone & (not && or a >&/<& redirection), which puts a job in the background
+_BACKGROUND_RE = re.compile(r"(?<![&<>])&(?!&)")
+
+# Characters that make a grep pattern a regular expression rather than a
+# literal, following grep's basic syntax: ( ) + ? | are plain characters and
+# ^ and $ only count as anchors at the start and end, so literal searches
+# like f(x), $HOME or $5 stay literal
+_REGEX_META_RE = re.compile(r"[.*\[\\]|^\^|\$$")
+
+# Maps the bytes bytes.split() treats as whitespace to 0 and every other byte
+# to 1, so in a translated chunk each word starts at a b"\x00\x01" pair
+_WORD_TABLE = bytes(0 if bytes([i]).isspace() else 1 for i in range(256))
+
+
+@lru_cache(maxsize=4096)
+def _fmt_mtime(minute: int) -> str:
+    """Format a modification time, given in whole minutes, for ls -l
+    
+    Keyed by minute because that is the display resolution, so files
+    written close together share a cache entry.
+    """
+    return time.strftime("%b %d %H:%M", time.localtime(minute * 60))
+
+
+def _bre_to_re(pattern: str) -> str:
+    """Translate a grep basic regular expression into Python re syntax
+    
+    Only . * [...] and backslash escapes carry over; ( ) { } + ? | are
+    literal unless backslashed (GNU's \\( \\| ... forms), and ^ and $ are
+    anchors only at the ends of the pattern.
+    """
+    out = []
+    i = 0
+    last = len(pattern) - 1
+    while i <= last:
+        char = pattern[i]
+        if char == '\\' and i < last:
+            escaped = pattern[i + 1]
+            out.append(escaped if escaped in '(){}+?|' else char + escaped)
+            i += 2
+            continue
+        if char == '[':
+            # Copy a bracket expression whole; a ] right after [ or [^ is a
+            # member, and backslashes inside are literal
+            end = i + 1
+            if end <= last and pattern[end] == '^':
+                end += 1
+            if end <= last and pattern[end] == ']':
+                end += 1
+            end = pattern.find(']', end)
+            if end == -1:
+                # Unmatched [, which fails to compile like it does in grep
+                out.append(pattern[i:])
+                break
+            out.append(pattern[i:end + 1].replace('\\', '\\\\'))
+            i = end + 1
+            continue
+        if (char == '^' and i == 0) or (char == '$' and i == last) or char in '.*':
+            out.append(char)
+        elif char in '(){}+?|^$':
+            out.append('\\' + char)
+        else:
+            out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def _hostname() -> str:
+    """This machine's name, as platform.node() reports it"""
+    if hasattr(os, 'uname'):
+        return os.uname().nodename
+    import socket
+    return socket.gethostname()
+
+
+@lru_cache(maxsize=256)
+def _which(command: str, search_path: Optional[str]) -> str:
+    """shutil.which, remembered per command and PATH value
+    
+    Keying on PATH means changing it starts from a clean slate. Misses
+    raise LookupError instead of returning None so that they are not
+    cached and a newly installed command is found on the next call.
+    """
+    found = shutil.which(command, path=search_path)
+    if found is None:
+        raise LookupError(command)
+    return found
+
+
+def _with_prefix(names, prefix: str):
+    """Yield the names in a sorted sequence that start with prefix, in order"""
+    for i in range(bisect_left(names, prefix), len(names)):
+        name = names[i]
+        if not name.startswith(prefix):
+            break
+        yield name
+
+
+def _join_rstripped(parts: List[str]) -> str:
+    """"".join(parts).rstrip(), without copying the joined text a second time
+    
+    Trailing whitespace can only come from the last parts, so those are
+    trimmed (in place) before the join instead of the result after it.
+    """
+    while parts and (not parts[-1] or parts[-1].isspace()):
+        parts.pop()
+    if parts:
+        parts[-1] = parts[-1].rstrip()
+    return "".join(parts)
+
+
+def _parse_line_count(command: str, args: List[str]) -> Tuple[int, List[str], Optional[str]]:
+    """Split head/tail arguments into (line count, files, error message)"""
+    lines = 10
+    files = []
+    args_iter = iter(args)
+    for arg in args_iter:
+        if arg[:1] != "-":
+            files.append(arg)
+        elif arg == "-n":
+            value = next(args_iter, None)
+            if value is None:
+                # A trailing -n falls through to the -NUM form, as it always has
+                return lines, files, f"{command}: invalid option '{arg}'"
+            try:
+                lines = int(value)
+            except ValueError:
+                return lines, files, f"{command}: invalid number '{value}'"
+        else:
+            try:
+                lines = int(arg[1:])
+            except ValueError:
+                return lines, files, f"{command}: invalid option '{arg}'"
+    return lines, files, None
+
+
+class _HistoryEntry:
+    """One command_history record; slots keep long histories compact"""
+    __slots__ = ('command', 'timestamp', 'directory')
+    
+    def __init__(self, command: str, timestamp: float, directory: str):
+        self.command = command
+        self.timestamp = timestamp
+        self.directory = directory
+
 
 class PythonTerminal:
+    # Built-in commands, mapped to the name of their handler method
+    _BUILTIN_DISPATCH = {
+        'cd': '_cmd_cd',
+        'pwd': '_cmd_pwd',
+        'ls': '_cmd_ls',
+        'dir': '_cmd_ls',  # Windows compatibility
+        'mkdir': '_cmd_mkdir',
+        'rmdir': '_cmd_rmdir',
+        'rm': '_cmd_rm',
+        'del': '_cmd_rm',  # Windows compatibility
+        'touch': '_cmd_touch',
+        'cat': '_cmd_cat',
+        'type': '_cmd_cat',  # Windows compatibility
+        'cp': '_cmd_cp',
+        'copy': '_cmd_cp',  # Windows compatibility
+        'mv': '_cmd_mv',
+        'move': '_cmd_mv',  # Windows compatibility
+        'find': '_cmd_find',
+        'ps': '_cmd_ps',
+        'kill': '_cmd_kill',
+        'top': '_cmd_top',
+        'df': '_cmd_df',
+        'du': '_cmd_du',
+        'whoami': '_cmd_whoami',
+        'date': '_cmd_date',
+        'echo': '_cmd_echo',
+        'env': '_cmd_env',
+        'set': '_cmd_set',
+        'export': '_cmd_export',
+        'history': '_cmd_history',
+        'clear': '_cmd_clear',
+        'cls': '_cmd_clear',  # Windows compatibility
+        'help': '_cmd_help',
+        'alias': '_cmd_alias',
+        'unalias': '_cmd_unalias',
+        'which': '_cmd_which',
+        'where': '_cmd_which',  # Windows compatibility
+        'tree': '_cmd_tree',
+        'wc': '_cmd_wc',
+        'head': '_cmd_head',
+        'tail': '_cmd_tail',
+        'grep': '_cmd_grep',
+        'findstr': '_cmd_grep',  # Windows compatibility
+    }
+    _BUILTINS = frozenset(_BUILTIN_DISPATCH)
+    # Sorted for completion, where names sharing a prefix form one run
+    _BUILTINS_SORTED = tuple(sorted(_BUILTIN_DISPATCH))
+    
+    # Number of threads used to list directories in parallel for du/find
+    _WALK_WORKERS = 8
+    # du/find list this many directories serially before deciding whether
+    # listings are slow enough (cold cache, network filesystem) to be worth
+    # spreading over threads; warm local listings take tens of microseconds
+    _WALK_PROBE_DIRS = 64
+    _SLOW_LISTING_SECONDS = 0.001
+    # Listings at least this large are stat()ed in parallel by ls -l
+    _BULK_STAT_THRESHOLD = 512
+    # Size of the reads used when streaming file contents
+    _READ_CHUNK_SIZE = 1 << 20
+    # Files smaller than this are read outright; mapping them costs more than it saves
+    _MMAP_THRESHOLD = 1 << 20
+    # Largest single in-kernel copy requested by cp
+    _COPY_CHUNK_SIZE = 1 << 30
+    # First block tail reads back from the end of a file; later blocks double
+    _TAIL_BLOCK_SIZE = 8192
+    # Oldest entries are dropped once the history holds this many commands
+    _HISTORY_SIZE = 10000
+    # ps/top reuse a process listing taken less than this many seconds ago
+    _PROC_SNAPSHOT_TTL = 2.0
+    # Number of processes kept in that listing, busiest first
+    _PROC_LIST_SIZE = 20
+    # Seconds an external command may run before it is killed
+    _SYSTEM_COMMAND_TIMEOUT = 30
+    # Most completions offered for one partial command
+    _SUGGESTION_LIMIT = 50
+    
     def __init__(self):
         self.current_dir = os.getcwd()
-        self.command_history = []
+        self.command_history = deque(maxlen=self._HISTORY_SIZE)
         self.aliases = {
             'll': 'ls -la',
             'la': 'ls -a',
-            'grep': 'findstr' if platform.system() == 'Windows' else 'grep'
+            'grep': 'findstr' if os.name == 'nt' else 'grep'
         }
-        self.environment_vars = dict(os.environ)
+        # Variables set with set/export layered over the live process environment
+        self._env_overrides = {}
+        self.environment_vars = ChainMap(self._env_overrides, os.environ)
+        # Pre-split alias expansions, sorted alias names and the rendered `env`
+        # listing, dropped whenever alias/unalias or set/export change what
+        # they were built from
+        self._alias_tokens = {}
+        self._aliases_sorted = None
+        self._env_output = None
+        self._proc_snapshot = None
+        # (directory, st_mtime_ns, sorted entry names) of the last directory completed in
+        self._listing_cache = None
+        # Native tools are far faster than the pure-Python grep/find below,
+        # which remain as the fallback (and on Windows, where find means FIND.EXE)
+        self._native_grep = shutil.which('grep') if os.name == 'posix' else None
+        self._native_find = shutil.which('find') if os.name == 'posix' else None
+        # Long-lived /bin/sh that runs external commands on POSIX, started on
+        # first use and restarted when the environment it was given goes stale.
+        # The lock keeps concurrent callers (server.py's threaded Flask app)
+        # from interleaving their commands and output on its pipes
+        self._shell = None
+        self._shell_lock = threading.Lock()
+        self._shell_env = None
+        self._shell_marker = None
+        # Prompt pieces; user and host are fixed for the life of the process and
+        # the shortened directory is refreshed by cd
+        self._user = os.getenv('USER', os.getenv('USERNAME', 'user'))
+        self._hostname = _hostname()
+        self._display_dir = self._shorten_dir(self.current_dir)
         
     def execute_command(self, command_line: str) -> Dict[str, Any]:
         """Execute a command and return structured result"""
@@ -28,82 +301,48 @@ class PythonTerminal:
             return {"output": "", "error": "", "exit_code": 0}
             
         # Add to history
-        self.command_history.append({
-            "command": command_line,
-            "timestamp": datetime.now().isoformat(),
-            "directory": self.current_dir
-        })
+        self.command_history.append(_HistoryEntry(command_line, time.time(), self.current_dir))
         
-        # Parse command
-        try:
-            parts = shlex.split(command_line.strip())
-        except ValueError as e:
-            return {"output": "", "error": f"Parse error: {str(e)}", "exit_code": 1}
+        # Parse command; words without quotes, escapes or unusual whitespace
+        # split exactly as shlex would, so skip the (slow) tokenizer for them
+        stripped = command_line.strip()
+        if _SIMPLE_CMD_RE.fullmatch(stripped):
+            parts = stripped.split()
+        else:
+            try:
+                parts = shlex.split(stripped)
+            except ValueError as e:
+                return {"output": "", "error": f"Parse error: {str(e)}", "exit_code": 1}
             
         if not parts:
             return {"output": "", "error": "", "exit_code": 0}
             
-        command = parts[0].lower()
+        # Names match case-insensitively, but most are typed in lower case
+        # already, so only fold case when the name as typed is unknown
+        command = parts[0]
         args = parts[1:] if len(parts) > 1 else []
+        if command not in self.aliases and command not in self._BUILTIN_DISPATCH:
+            command = command.lower()
         
         # Check for aliases
-        if command in self.aliases:
-            expanded = self.aliases[command]
+        expanded = self.aliases.get(command)
+        if expanded is not None:
             try:
-                parts = shlex.split(expanded) + args
-                command = parts[0].lower()
+                tokens = self._alias_tokens.get(command)
+                if tokens is None:
+                    tokens = self._alias_tokens[command] = shlex.split(expanded)
+                parts = tokens + args
+                command = parts[0]
+                if command not in self._BUILTIN_DISPATCH:
+                    command = command.lower()
                 args = parts[1:]
             except ValueError:
                 pass
         
-        # Built-in commands
-        builtin_commands = {
-            'cd': self._cmd_cd,
-            'pwd': self._cmd_pwd,
-            'ls': self._cmd_ls,
-            'dir': self._cmd_ls,  # Windows compatibility
-            'mkdir': self._cmd_mkdir,
-            'rmdir': self._cmd_rmdir,
-            'rm': self._cmd_rm,
-            'del': self._cmd_rm,  # Windows compatibility
-            'touch': self._cmd_touch,
-            'cat': self._cmd_cat,
-            'type': self._cmd_cat,  # Windows compatibility
-            'cp': self._cmd_cp,
-            'copy': self._cmd_cp,  # Windows compatibility
-            'mv': self._cmd_mv,
-            'move': self._cmd_mv,  # Windows compatibility
-            'find': self._cmd_find,
-            'ps': self._cmd_ps,
-            'kill': self._cmd_kill,
-            'top': self._cmd_top,
-            'df': self._cmd_df,
-            'du': self._cmd_du,
-            'whoami': self._cmd_whoami,
-            'date': self._cmd_date,
-            'echo': self._cmd_echo,
-            'env': self._cmd_env,
-            'set': self._cmd_set,
-            'export': self._cmd_export,
-            'history': self._cmd_history,
-            'clear': self._cmd_clear,
-            'cls': self._cmd_clear,  # Windows compatibility
-            'help': self._cmd_help,
-            'alias': self._cmd_alias,
-            'unalias': self._cmd_unalias,
-            'which': self._cmd_which,
-            'where': self._cmd_which,  # Windows compatibility
-            'tree': self._cmd_tree,
-            'wc': self._cmd_wc,
-            'head': self._cmd_head,
-            'tail': self._cmd_tail,
-            'grep': self._cmd_grep,
-            'findstr': self._cmd_grep,  # Windows compatibility
-        }
-        
+        handler = self._BUILTIN_DISPATCH.get(command)
         try:
-            if command in builtin_commands:
-                return builtin_commands[command](args)
+            if handler is not None:
+                return getattr(self, handler)(args)
             else:
                 # Try to execute as system command
                 return self._execute_system_command(command_line)
@@ -129,6 +368,7 @@ class PythonTerminal:
         
         if os.path.isdir(target):
             self.current_dir = target
+            self._display_dir = self._shorten_dir(target)
             os.chdir(target)
             return {"output": "", "error": "", "exit_code": 0}
         else:
@@ -156,38 +396,39 @@ class PythonTerminal:
                 if long_format:
                     stat = os.stat(target_dir)
                     size = stat.st_size
-                    mtime = datetime.fromtimestamp(stat.st_mtime).strftime("%b %d %H:%M")
+                    mtime = _fmt_mtime(int(stat.st_mtime) // 60)
                     mode = oct(stat.st_mode)[-3:]
                     return {"output": f"-rw-r--r-- 1 user user {size:>8} {mtime} {os.path.basename(target_dir)}", "error": "", "exit_code": 0}
                 else:
                     return {"output": os.path.basename(target_dir), "error": "", "exit_code": 0}
             
-            items = os.listdir(target_dir)
-            if not show_all:
-                items = [item for item in items if not item.startswith('.')]
+            # scandir hands back the entry type with the listing, so each
+            # entry costs at most one stat() instead of a stat() + isdir()
+            with os.scandir(target_dir) as it:
+                entries = [entry for entry in it if show_all or not entry.name.startswith('.')]
                 
-            items.sort()
+            entries.sort(key=lambda entry: entry.name)
             
             if long_format:
+                self._bulk_stat(entries)
                 output_lines = []
-                for item in items:
-                    item_path = os.path.join(target_dir, item)
+                for entry in entries:
                     try:
-                        stat = os.stat(item_path)
-                        is_dir = os.path.isdir(item_path)
+                        stat = entry.stat()
+                        is_dir = entry.is_dir()
                         size = stat.st_size if not is_dir else 4096
-                        mtime = datetime.fromtimestamp(stat.st_mtime).strftime("%b %d %H:%M")
+                        mtime = _fmt_mtime(int(stat.st_mtime) // 60)
                         mode_char = "d" if is_dir else "-"
                         permissions = "rwxr-xr-x" if is_dir else "rw-r--r--"
-                        output_lines.append(f"{mode_char}{permissions} 1 user user {size:>8} {mtime} {item}")
+                        output_lines.append(f"{mode_char}{permissions} 1 user user {size:>8} {mtime} {entry.name}")
                     except OSError:
-                        output_lines.append(f"?????????? ? ?    ?        ?            ? {item}")
+                        output_lines.append(f"?????????? ? ?    ?        ?            ? {entry.name}")
                 return {"output": "\n".join(output_lines), "error": "", "exit_code": 0}
             else:
                 # Simple format - arrange in columns
-                if not items:
+                if not entries:
                     return {"output": "", "error": "", "exit_code": 0}
-                return {"output": "  ".join(items), "error": "", "exit_code": 0}
+                return {"output": "  ".join(entry.name for entry in entries), "error": "", "exit_code": 0}
                 
         except PermissionError:
             return {"output": "", "error": f"ls: cannot access '{target_dir}': Permission denied", "exit_code": 1}
@@ -263,7 +504,6 @@ class PythonTerminal:
             try:
                 if os.path.isdir(file_path):
                     if recursive:
-                        import shutil
                         shutil.rmtree(file_path)
                     else:
                         errors.append(f"rm: cannot remove '{file_name}': Is a directory")
@@ -300,20 +540,33 @@ class PythonTerminal:
         if not args:
             return {"output": "", "error": "cat: missing operand", "exit_code": 1}
             
-        output_lines = []
-        for file_name in args:
+        # Copy in chunks straight into one buffer rather than holding each
+        # file's full read(), its rstrip() copy and the final join at once
+        output = io.StringIO()
+        for i, file_name in enumerate(args):
             if not os.path.isabs(file_name):
                 file_path = os.path.join(self.current_dir, file_name)
             else:
                 file_path = file_name
                 
+            if i:
+                output.write("\n")
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    output_lines.append(f.read().rstrip())
+                with self._open_text(file_path) as f:
+                    # Hold back trailing whitespace so it can be dropped at EOF
+                    pending = ""
+                    for chunk in iter(lambda: f.read(self._READ_CHUNK_SIZE), ""):
+                        stripped = chunk.rstrip()
+                        if stripped:
+                            output.write(pending)
+                            output.write(stripped)
+                            pending = chunk[len(stripped):]
+                        else:
+                            pending += chunk
             except OSError as e:
                 return {"output": "", "error": f"cat: {file_name}: {str(e)}", "exit_code": 1}
                 
-        return {"output": "\n".join(output_lines), "error": "", "exit_code": 0}
+        return {"output": output.getvalue(), "error": "", "exit_code": 0}
     
     def _cmd_cp(self, args: List[str]) -> Dict[str, Any]:
         """Copy files/directories"""
@@ -335,7 +588,6 @@ class PythonTerminal:
             dest_path = dest
             
         try:
-            import shutil
             if len(source_files) == 1:
                 src = source_files[0]
                 if not os.path.isabs(src):
@@ -347,13 +599,13 @@ class PythonTerminal:
                     if recursive:
                         if os.path.exists(dest_path):
                             dest_path = os.path.join(dest_path, os.path.basename(src_path))
-                        shutil.copytree(src_path, dest_path)
+                        shutil.copytree(src_path, dest_path, copy_function=self._copy_file)
                     else:
                         return {"output": "", "error": f"cp: -r not specified; omitting directory '{src}'", "exit_code": 1}
                 else:
                     if os.path.isdir(dest_path):
                         dest_path = os.path.join(dest_path, os.path.basename(src_path))
-                    shutil.copy2(src_path, dest_path)
+                    self._copy_file(src_path, dest_path)
             else:
                 # Multiple sources - destination must be directory
                 if not os.path.isdir(dest_path):
@@ -366,9 +618,9 @@ class PythonTerminal:
                         src_path = src
                     
                     if os.path.isdir(src_path) and recursive:
-                        shutil.copytree(src_path, os.path.join(dest_path, os.path.basename(src_path)))
+                        shutil.copytree(src_path, os.path.join(dest_path, os.path.basename(src_path)), copy_function=self._copy_file)
                     elif os.path.isfile(src_path):
-                        shutil.copy2(src_path, dest_path)
+                        self._copy_file(src_path, dest_path)
                         
         except OSError as e:
             return {"output": "", "error": f"cp: {str(e)}", "exit_code": 1}
@@ -389,7 +641,6 @@ class PythonTerminal:
             dest_path = dest
             
         try:
-            import shutil
             if len(source_files) == 1:
                 src = source_files[0]
                 if not os.path.isabs(src):
@@ -399,7 +650,18 @@ class PythonTerminal:
                     
                 if os.path.isdir(dest_path):
                     dest_path = os.path.join(dest_path, os.path.basename(src_path))
-                shutil.move(src_path, dest_path)
+                    
+                if os.path.isdir(dest_path):
+                    shutil.move(src_path, dest_path)
+                else:
+                    # A plain rename is one atomic syscall; shutil.move is only
+                    # needed to copy across filesystems
+                    try:
+                        os.replace(src_path, dest_path)
+                    except OSError as e:
+                        if e.errno != errno.EXDEV:
+                            raise
+                        shutil.move(src_path, dest_path)
             else:
                 # Multiple sources - destination must be directory
                 if not os.path.isdir(dest_path):
@@ -436,13 +698,33 @@ class PythonTerminal:
         if not os.path.isabs(search_dir):
             search_dir = os.path.join(self.current_dir, search_dir)
             
+        # -H follows a symlinked starting directory, as scandir does below
+        if self._native_find:
+            result = self._run_native([self._native_find, '-H', search_dir, '-mindepth', '1', '-name', pattern])
+            if result is not None and result.returncode == 0:
+                output = result.stdout.decode('utf-8', errors='replace')
+                return {"output": output.removesuffix("\n"), "error": "", "exit_code": 0}
+            
         results = []
         try:
-            import fnmatch
-            for root, dirs, files in os.walk(search_dir):
-                for name in files + dirs:
-                    if fnmatch.fnmatch(name, pattern):
-                        results.append(os.path.join(root, name))
+            # Translate the glob once instead of per name; fnmatch is case-insensitive on Windows
+            match = re.compile(fnmatch.translate(pattern), re.IGNORECASE if os.name == 'nt' else 0).match
+            
+            # Directories are listed concurrently, then replayed top-down in os.walk order
+            listings = {directory: (files, dirs) for directory, files, dirs in self._scan_tree(search_dir)}
+            pending = [search_dir]
+            while pending:
+                listing = listings.get(pending.pop())
+                if listing is None:
+                    continue
+                    
+                files, dirs = listing
+                for entry in files + dirs:
+                    if match(entry.name):
+                        results.append(entry.path)
+                        
+                # Only directories that were descended into have a listing
+                pending.extend(entry.path for entry in reversed(dirs) if entry.path in listings)
         except OSError as e:
             return {"output": "", "error": f"find: {str(e)}", "exit_code": 1}
             
@@ -451,29 +733,15 @@ class PythonTerminal:
     def _cmd_ps(self, args: List[str]) -> Dict[str, Any]:
         """List running processes"""
         try:
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_info']):
-                try:
-                    pinfo = proc.info
-                    processes.append({
-                        'pid': pinfo['pid'],
-                        'name': pinfo['name'],
-                        'cpu': pinfo['cpu_percent'],
-                        'memory': pinfo['memory_info'].rss if pinfo['memory_info'] else 0
-                    })
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
-                    
-            # Sort by CPU usage
-            processes.sort(key=lambda x: x['cpu'] or 0, reverse=True)
+            processes = self._process_snapshot()
             
             output_lines = ["PID     NAME                 CPU%    MEMORY"]
             output_lines.append("-" * 50)
             
-            for proc in processes[:20]:  # Show top 20
-                memory_mb = proc['memory'] / (1024 * 1024)
-                cpu_str = f"{proc['cpu']:.1f}%" if proc['cpu'] else "0.0%"
-                output_lines.append(f"{proc['pid']:<8} {proc['name']:<20} {cpu_str:<8} {memory_mb:.1f}MB")
+            for pid, name, cpu, memory in processes[:20]:  # Show top 20
+                memory_mb = memory / (1024 * 1024)
+                cpu_str = f"{cpu:.1f}%" if cpu else "0.0%"
+                output_lines.append(f"{pid:<8} {name:<20} {cpu_str:<8} {memory_mb:.1f}MB")
                 
             return {"output": "\n".join(output_lines), "error": "", "exit_code": 0}
             
@@ -485,6 +753,7 @@ class PythonTerminal:
         if not args:
             return {"output": "", "error": "kill: missing operand", "exit_code": 1}
             
+        import psutil
         try:
             pid = int(args[0])
             proc = psutil.Process(pid)
@@ -499,9 +768,13 @@ class PythonTerminal:
     
     def _cmd_top(self, args: List[str]) -> Dict[str, Any]:
         """Display system resource usage"""
+        import platform
+        import psutil
         try:
-            # System info
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # System info; CPU usage is measured since the previous sample
+            # instead of blocking for a fresh one-second interval
+            processes = self._process_snapshot()
+            cpu_percent = psutil.cpu_percent(interval=None)
             memory = psutil.virtual_memory()
             disk = psutil.disk_usage('/')
             
@@ -515,25 +788,10 @@ class PythonTerminal:
                 "PID     NAME                 CPU%    MEMORY"
             ]
             
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_info']):
-                try:
-                    pinfo = proc.info
-                    processes.append({
-                        'pid': pinfo['pid'],
-                        'name': pinfo['name'],
-                        'cpu': pinfo['cpu_percent'],
-                        'memory': pinfo['memory_info'].rss if pinfo['memory_info'] else 0
-                    })
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
-                    
-            processes.sort(key=lambda x: x['cpu'] or 0, reverse=True)
-            
-            for proc in processes[:10]:
-                memory_mb = proc['memory'] / (1024 * 1024)
-                cpu_str = f"{proc['cpu']:.1f}%" if proc['cpu'] else "0.0%"
-                output_lines.append(f"{proc['pid']:<8} {proc['name']:<20} {cpu_str:<8} {memory_mb:.1f}MB")
+            for pid, name, cpu, memory in processes[:10]:
+                memory_mb = memory / (1024 * 1024)
+                cpu_str = f"{cpu:.1f}%" if cpu else "0.0%"
+                output_lines.append(f"{pid:<8} {name:<20} {cpu_str:<8} {memory_mb:.1f}MB")
                 
             return {"output": "\n".join(output_lines), "error": "", "exit_code": 0}
             
@@ -542,6 +800,7 @@ class PythonTerminal:
     
     def _cmd_df(self, args: List[str]) -> Dict[str, Any]:
         """Display filesystem disk space usage"""
+        import psutil
         try:
             output_lines = ["Filesystem      Size  Used Avail Use% Mounted on"]
             
@@ -574,11 +833,11 @@ class PythonTerminal:
             
         try:
             total_size = 0
-            for dirpath, dirnames, filenames in os.walk(target_dir):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
+            for directory, files, dirs in self._scan_tree(target_dir, stat_files=True):
+                for entry in files:
                     try:
-                        total_size += os.path.getsize(filepath)
+                        # lstat, like du: count a symlink itself, not its target
+                        total_size += entry.stat(follow_symlinks=False).st_size
                     except OSError:
                         continue
                         
@@ -590,7 +849,6 @@ class PythonTerminal:
     
     def _cmd_whoami(self, args: List[str]) -> Dict[str, Any]:
         """Display current username"""
-        import getpass
         return {"output": getpass.getuser(), "error": "", "exit_code": 0}
     
     def _cmd_date(self, args: List[str]) -> Dict[str, Any]:
@@ -603,10 +861,12 @@ class PythonTerminal:
     
     def _cmd_env(self, args: List[str]) -> Dict[str, Any]:
         """Display environment variables"""
-        output_lines = []
-        for key, value in sorted(self.environment_vars.items()):
-            output_lines.append(f"{key}={value}")
-        return {"output": "\n".join(output_lines), "error": "", "exit_code": 0}
+        if self._env_output is None:
+            output_lines = []
+            for key, value in sorted(self.environment_vars.items()):
+                output_lines.append(f"{key}={value}")
+            self._env_output = "\n".join(output_lines)
+        return {"output": self._env_output, "error": "", "exit_code": 0}
     
     def _cmd_set(self, args: List[str]) -> Dict[str, Any]:
         """Set environment variable (Windows style)"""
@@ -615,7 +875,8 @@ class PythonTerminal:
             
         if "=" in args[0]:
             key, value = args[0].split("=", 1)
-            self.environment_vars[key] = value
+            self._env_overrides[key] = value
+            self._env_output = None
             return {"output": "", "error": "", "exit_code": 0}
         else:
             return {"output": "", "error": "set: invalid format", "exit_code": 1}
@@ -628,19 +889,22 @@ class PythonTerminal:
         for arg in args:
             if "=" in arg:
                 key, value = arg.split("=", 1)
-                self.environment_vars[key] = value
+                self._env_overrides[key] = value
+                self._env_output = None
             else:
                 # Export existing variable
                 if arg in os.environ:
-                    self.environment_vars[arg] = os.environ[arg]
+                    self._env_overrides[arg] = os.environ[arg]
+                    self._env_output = None
                     
         return {"output": "", "error": "", "exit_code": 0}
     
     def _cmd_history(self, args: List[str]) -> Dict[str, Any]:
         """Display command history"""
         output_lines = []
-        for i, entry in enumerate(self.command_history[-50:], 1):  # Show last 50
-            output_lines.append(f"{i:>4}  {entry['command']}")
+        recent = islice(self.command_history, max(0, len(self.command_history) - 50), None)
+        for i, entry in enumerate(recent, 1):  # Show last 50
+            output_lines.append(f"{i:>4}  {entry.command}")
         return {"output": "\n".join(output_lines), "error": "", "exit_code": 0}
     
     def _cmd_clear(self, args: List[str]) -> Dict[str, Any]:
@@ -711,6 +975,8 @@ Aliases and Variables:
             if "=" in arg:
                 name, command = arg.split("=", 1)
                 self.aliases[name] = command.strip("'\"")
+                self._alias_tokens.pop(name, None)
+                self._aliases_sorted = None
             else:
                 return {"output": "", "error": f"alias: invalid format '{arg}'", "exit_code": 1}
                 
@@ -724,6 +990,8 @@ Aliases and Variables:
         for name in args:
             if name in self.aliases:
                 del self.aliases[name]
+                self._alias_tokens.pop(name, None)
+                self._aliases_sorted = None
             else:
                 return {"output": "", "error": f"unalias: {name}: not found", "exit_code": 1}
                 
@@ -737,28 +1005,28 @@ Aliases and Variables:
         command = args[0]
         
         # Check built-in commands
-        builtin_commands = [
-            'cd', 'pwd', 'ls', 'dir', 'mkdir', 'rmdir', 'rm', 'del', 'touch',
-            'cat', 'type', 'cp', 'copy', 'mv', 'move', 'find', 'ps', 'kill',
-            'top', 'df', 'du', 'whoami', 'date', 'echo', 'env', 'set', 'export',
-            'history', 'clear', 'cls', 'help', 'alias', 'unalias', 'which',
-            'where', 'tree', 'wc', 'head', 'tail', 'grep', 'findstr'
-        ]
-        
-        if command in builtin_commands:
+        if command in self._BUILTINS:
             return {"output": f"{command}: shell builtin", "error": "", "exit_code": 0}
         
         # Check aliases
         if command in self.aliases:
             return {"output": f"{command}: aliased to '{self.aliases[command]}'", "error": "", "exit_code": 0}
         
-        # Check system PATH
-        import shutil
-        path = shutil.which(command)
-        if path:
-            return {"output": path, "error": "", "exit_code": 0}
+        # Check system PATH, as seen by the commands this terminal runs. Names
+        # with a directory part (and, on Windows, every name) are resolved
+        # against the current directory, which the cache isn't keyed on
+        search_path = self.environment_vars.get('PATH')
+        if os.path.dirname(command) or os.name == 'nt':
+            path = shutil.which(command, path=search_path)
         else:
+            try:
+                path = _which(command, search_path)
+            except LookupError:
+                path = None
+                
+        if path is None:
             return {"output": "", "error": f"which: {command}: not found", "exit_code": 1}
+        return {"output": path, "error": "", "exit_code": 0}
     
     def _cmd_tree(self, args: List[str]) -> Dict[str, Any]:
         """Display directory tree"""
@@ -770,31 +1038,43 @@ Aliases and Variables:
         if not os.path.isdir(target_dir):
             return {"output": "", "error": f"tree: {target_dir}: No such directory", "exit_code": 1}
         
-        def build_tree(directory, prefix="", max_depth=3, current_depth=0):
-            if current_depth >= max_depth:
-                return []
-                
-            items = []
+        max_depth = 3
+        tree_lines = [target_dir]
+        # Directories being listed, innermost last, as (remaining numbered
+        # entries, index of the last entry, line prefix, depth)
+        stack = []
+        
+        def enter(directory, prefix, depth):
             try:
-                entries = sorted(os.listdir(directory))
-                for i, entry in enumerate(entries):
-                    if entry.startswith('.'):
-                        continue
-                        
-                    path = os.path.join(directory, entry)
-                    is_last = i == len(entries) - 1
-                    current_prefix = "└── " if is_last else "├── "
-                    items.append(prefix + current_prefix + entry)
-                    
-                    if os.path.isdir(path):
-                        extension = "    " if is_last else "│   "
-                        items.extend(build_tree(path, prefix + extension, max_depth, current_depth + 1))
+                # DirEntry carries the type from the listing, so telling
+                # directories apart costs no stat() per entry
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
             except PermissionError:
-                items.append(prefix + "├── [Permission Denied]")
-                
-            return items
+                tree_lines.append(prefix + "├── [Permission Denied]")
+                return
+            stack.append((enumerate(entries), len(entries) - 1, prefix, depth))
         
-        tree_lines = [target_dir] + build_tree(target_dir)
+        enter(target_dir, "", 0)
+        while stack:
+            entries, last, prefix, depth = stack[-1]
+            for i, entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                    
+                is_last = i == last
+                current_prefix = "└── " if is_last else "├── "
+                tree_lines.append(prefix + current_prefix + entry.name)
+                
+                # Like tree(1), don't follow symlinked directories
+                if depth + 1 < max_depth and entry.is_dir(follow_symlinks=False):
+                    extension = "    " if is_last else "│   "
+                    enter(entry.path, prefix + extension, depth + 1)
+                    # Finish the subdirectory before the rest of this one
+                    break
+            else:
+                stack.pop()
+                
         return {"output": "\n".join(tree_lines), "error": "", "exit_code": 0}
     
     def _cmd_wc(self, args: List[str]) -> Dict[str, Any]:
@@ -810,11 +1090,21 @@ Aliases and Variables:
                 file_path = file_name
                 
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    content = f.read()
-                    lines = content.count('\n')
-                    words = len(content.split())
-                    chars = len(content)
+                with open(file_path, 'rb', buffering=0) as f:
+                    # Count bytes like POSIX wc, a chunk at a time so memory
+                    # stays flat. Words are counted as whitespace-to-word
+                    # transitions in C, without split() building every word;
+                    # pairing each chunk's first byte with the previous one's
+                    # last (whitespace at the start) catches words that begin
+                    # right on a chunk boundary
+                    lines = words = chars = 0
+                    last = b'\x00'
+                    for chunk in iter(lambda: f.read(self._READ_CHUNK_SIZE), b''):
+                        chars += len(chunk)
+                        lines += chunk.count(b'\n')
+                        kinds = chunk.translate(_WORD_TABLE)
+                        words += (last + kinds[:1]).count(b'\x00\x01') + kinds.count(b'\x00\x01')
+                        last = kinds[-1:]
                     results.append(f"{lines:8} {words:8} {chars:8} {file_name}")
             except OSError as e:
                 return {"output": "", "error": f"wc: {file_name}: {str(e)}", "exit_code": 1}
@@ -823,27 +1113,10 @@ Aliases and Variables:
     
     def _cmd_head(self, args: List[str]) -> Dict[str, Any]:
         """Show first lines of file"""
-        lines = 10
-        files = []
-        
-        i = 0
-        while i < len(args):
-            if args[i] == "-n" and i + 1 < len(args):
-                try:
-                    lines = int(args[i + 1])
-                    i += 2
-                except ValueError:
-                    return {"output": "", "error": f"head: invalid number '{args[i + 1]}'", "exit_code": 1}
-            elif args[i].startswith("-"):
-                try:
-                    lines = int(args[i][1:])
-                    i += 1
-                except ValueError:
-                    return {"output": "", "error": f"head: invalid option '{args[i]}'", "exit_code": 1}
-            else:
-                files.append(args[i])
-                i += 1
-        
+        lines, files, error = _parse_line_count("head", args)
+        if error:
+            return {"output": "", "error": error, "exit_code": 1}
+            
         if not files:
             return {"output": "", "error": "head: missing operand", "exit_code": 1}
             
@@ -855,37 +1128,29 @@ Aliases and Variables:
                 file_path = file_name
                 
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    file_lines = f.readlines()
-                    results.extend(file_lines[:lines])
+                with self._open_text(file_path) as f:
+                    if lines >= 0:
+                        # Stop reading once enough lines are in hand
+                        results.extend(islice(f, lines))
+                    else:
+                        # A negative count drops lines from the end; hold back
+                        # only that many, passing each on as it leaves the window
+                        window = deque(maxlen=-lines)
+                        for line in f:
+                            if len(window) == window.maxlen:
+                                results.append(window[0])
+                            window.append(line)
             except OSError as e:
                 return {"output": "", "error": f"head: {file_name}: {str(e)}", "exit_code": 1}
                 
-        return {"output": "".join(results).rstrip(), "error": "", "exit_code": 0}
+        return {"output": _join_rstripped(results), "error": "", "exit_code": 0}
     
     def _cmd_tail(self, args: List[str]) -> Dict[str, Any]:
         """Show last lines of file"""
-        lines = 10
-        files = []
-        
-        i = 0
-        while i < len(args):
-            if args[i] == "-n" and i + 1 < len(args):
-                try:
-                    lines = int(args[i + 1])
-                    i += 2
-                except ValueError:
-                    return {"output": "", "error": f"tail: invalid number '{args[i + 1]}'", "exit_code": 1}
-            elif args[i].startswith("-"):
-                try:
-                    lines = int(args[i][1:])
-                    i += 1
-                except ValueError:
-                    return {"output": "", "error": f"tail: invalid option '{args[i]}'", "exit_code": 1}
-            else:
-                files.append(args[i])
-                i += 1
-        
+        lines, files, error = _parse_line_count("tail", args)
+        if error:
+            return {"output": "", "error": error, "exit_code": 1}
+            
         if not files:
             return {"output": "", "error": "tail: missing operand", "exit_code": 1}
             
@@ -897,13 +1162,32 @@ Aliases and Variables:
                 file_path = file_name
                 
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    file_lines = f.readlines()
-                    results.extend(file_lines[-lines:] if lines <= len(file_lines) else file_lines)
+                with open(file_path, 'rb') as f:
+                    if lines > 0 and f.seekable():
+                        # Read backwards from the end in growing blocks until more
+                        # line breaks than lines wanted are found, so the partial
+                        # first line of the data is never among those returned
+                        pos = f.seek(0, os.SEEK_END)
+                        block = self._TAIL_BLOCK_SIZE
+                        data = b""
+                        while pos > 0:
+                            step = min(block, pos)
+                            pos -= step
+                            f.seek(pos)
+                            data = f.read(step) + data
+                            if data.count(b'\n') + data.count(b'\r') - data.count(b'\r\n') > lines:
+                                break
+                            block *= 2
+                    else:
+                        # Pipes can't seek; the whole input is needed anyway
+                        data = f.read()
+                    file_lines = data.splitlines(keepends=True)
+                    selected = file_lines[-lines:] if lines <= len(file_lines) else file_lines
+                    results.append(self._decode_text(b"".join(selected)))
             except OSError as e:
                 return {"output": "", "error": f"tail: {file_name}: {str(e)}", "exit_code": 1}
                 
-        return {"output": "".join(results).rstrip(), "error": "", "exit_code": 0}
+        return {"output": _join_rstripped(results), "error": "", "exit_code": 0}
     
     def _cmd_grep(self, args: List[str]) -> Dict[str, Any]:
         """Search for pattern in files"""
@@ -913,33 +1197,456 @@ Aliases and Variables:
         pattern = args[0]
         files = args[1:]
         
+        # Patterns with regex metacharacters are translated from grep's basic
+        # syntax and compiled once for all files; one that does not compile is
+        # searched for literally instead
+        prog = None
+        if _REGEX_META_RE.search(pattern):
+            try:
+                prog = re.compile(_bre_to_re(pattern))
+            except re.error:
+                pass
+                
+        # Native grep handles literal patterns (its regex dialect differs from
+        # Python's); errors (exit status 2) are left to the Python path to report
+        if prog is None and self._native_grep:
+            # grep reads stdin for a bare - even after --; the Python path
+            # treats it as a file name, so spell it as one (and label it back)
+            operands = ['./-' if name == '-' else name for name in files]
+            relabel = '-' in files and './-' not in files
+            result = self._run_native([self._native_grep, '-F', '-n', '-H', '-a', '-e', pattern, '--', *operands])
+            if result is not None and result.returncode in (0, 1):
+                lines = result.stdout.decode('utf-8', errors='replace').removesuffix("\n").split("\n")
+                if relabel:
+                    lines = [line[2:] if line.startswith('./-:') else line for line in lines]
+                return {"output": "\n".join(line.rstrip() for line in lines), "error": "", "exit_code": 0}
+            
+        needle = pattern.encode('utf-8')
+        if len(files) == 1:
+            outcomes = [self._grep_one(prog, needle, files[0])]
+        else:
+            # Only the read() syscalls release the GIL; searching, decoding and
+            # page faults on mapped files do not. So the threads overlap just
+            # the reads: that helps on cold or network storage and is break-even
+            # on cached files. map() keeps results in argument order
+            with ThreadPoolExecutor(max_workers=min(self._WALK_WORKERS, len(files))) as executor:
+                outcomes = list(executor.map(lambda file_name: self._grep_one(prog, needle, file_name), files))
+                
         results = []
-        for file_name in files:
-            if not os.path.isabs(file_name):
-                file_path = os.path.join(self.current_dir, file_name)
-            else:
-                file_path = file_name
+        for matches, error in outcomes:
+            if error:
+                return {"output": "", "error": error, "exit_code": 1}
+            results.extend(matches)
+            
+        return {"output": "\n".join(results), "error": "", "exit_code": 0}
+    
+    def _grep_one(self, prog: Optional[re.Pattern], needle: bytes, file_name: str) -> Tuple[List[str], Optional[str]]:
+        """Search one file for grep, returning (matching lines, error message)
+        
+        Only \n ends a line, as in GNU grep, which handles literal patterns on
+        POSIX; keeping both paths on the same rule keeps their line numbers
+        in step. A lone \r (old Mac line endings) therefore stays inside its
+        line, where . can match it; the \r of a CRLF ending is dropped.
+        """
+        if not os.path.isabs(file_name):
+            file_path = os.path.join(self.current_dir, file_name)
+        else:
+            file_path = file_name
+            
+        results = []
+        try:
+            with open(file_path, 'rb', buffering=self._READ_CHUNK_SIZE) as f:
+                if prog is not None:
+                    for line_num, line in enumerate(f, 1):
+                        text = line.decode('utf-8', errors='replace').rstrip('\r\n')
+                        if prog.search(text):
+                            results.append(f"{file_name}:{line_num}:{text.rstrip()}")
+                    return results, None
+                    
+                # Search the mapped bytes directly and only decode matching lines
+                buf = self._map_file(f)
+                try:
+                    # line_num is the number of the line starting at offset counted_to
+                    line_num = 1
+                    counted_to = 0
+                    pos = buf.find(needle)
+                    while 0 <= pos < len(buf):
+                        start = buf.rfind(b'\n', 0, pos) + 1
+                        end = buf.find(b'\n', pos)
+                        if end == -1:
+                            end = len(buf)
+                        if start > counted_to:
+                            line_num += self._count_newlines(buf, counted_to, start)
+                        line = buf[start:end].decode('utf-8', errors='replace')
+                        results.append(f"{file_name}:{line_num}:{line.rstrip()}")
+                        counted_to = end + 1
+                        line_num += 1
+                        pos = buf.find(needle, counted_to)
+                finally:
+                    if isinstance(buf, mmap.mmap):
+                        buf.close()
+        except OSError as e:
+            return [], f"grep: {file_name}: {str(e)}"
+            
+        return results, None
+    
+    def _run_native(self, argv: List[str]) -> Optional["subprocess.CompletedProcess"]:
+        """Run a native tool in the current directory, or None if it could not run
+        
+        stdin is closed off so a tool that falls back to reading it never
+        blocks on the terminal (or the server's stdin). Output is left as
+        bytes: text mode would also split lines on a lone \r.
+        """
+        import subprocess
+        try:
+            return subprocess.run(
+                argv,
+                cwd=self.current_dir,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                timeout=30
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+    
+    def _process_snapshot(self) -> List[Tuple[int, str, float, int]]:
+        """The busiest processes as (pid, name, cpu, memory) tuples, shared by ps and top"""
+        now = time.monotonic()
+        if self._proc_snapshot is not None and now - self._proc_snapshot[0] < self._PROC_SNAPSHOT_TTL:
+            return self._proc_snapshot[1]
+            
+        import psutil
+        if self._proc_snapshot is None:
+            # cpu_percent() reports usage since its previous call, so the first
+            # reading needs a short baseline or every process shows 0.0
+            psutil.cpu_percent(interval=None)
+            for proc in psutil.process_iter():
+                try:
+                    proc.cpu_percent()
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+            time.sleep(0.1)
+            
+        processes = []
+        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_info']):
+            try:
+                pinfo = proc.info
+                processes.append((
+                    pinfo['pid'],
+                    pinfo['name'],
+                    pinfo['cpu_percent'] or 0.0,
+                    pinfo['memory_info'].rss if pinfo['memory_info'] else 0
+                ))
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
                 
+        # Only the top rows are ever displayed, so skip sorting the rest
+        processes = heapq.nlargest(self._PROC_LIST_SIZE, processes, key=itemgetter(2))
+        
+        self._proc_snapshot = (time.monotonic(), processes)
+        return processes
+    
+    def _copy_file(self, src: str, dst: str) -> str:
+        """Copy a file and its metadata like shutil.copy2, in-kernel where possible
+        
+        os.copy_file_range lets the kernel move (or reflink) the data without
+        a round trip through user space. Where it is unavailable or refused,
+        the copy carries on with a plain buffered read/write.
+        """
+        if not hasattr(os, 'copy_file_range'):
+            return shutil.copy2(src, dst)
+            
+        if os.path.isdir(dst):
+            dst = os.path.join(dst, os.path.basename(src))
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+            
+        # Opening a named pipe would block until a writer shows up, so refuse
+        # special files up front as shutil.copyfile does
+        for path in (src, dst):
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    for line_num, line in enumerate(f, 1):
-                        if pattern in line:
-                            results.append(f"{file_name}:{line_num}:{line.rstrip()}")
+                mode = os.stat(path).st_mode
+            except OSError:
+                continue
+            if S_ISFIFO(mode):
+                raise shutil.SpecialFileError(f"`{path}` is a named pipe")
+            if S_ISSOCK(mode):
+                raise shutil.SpecialFileError(f"`{path}` is a socket")
+                
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            infd, outfd = fsrc.fileno(), fdst.fileno()
+            try:
+                # Pseudo-files (procfs, sysfs) report 0 bytes copied even when
+                # they have content, so only trust copy_file_range once it copies
+                if os.copy_file_range(infd, outfd, self._COPY_CHUNK_SIZE):
+                    while os.copy_file_range(infd, outfd, self._COPY_CHUNK_SIZE):
+                        pass
+                else:
+                    shutil.copyfileobj(fsrc, fdst, self._READ_CHUNK_SIZE)
             except OSError as e:
-                return {"output": "", "error": f"grep: {file_name}: {str(e)}", "exit_code": 1}
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF):
+                    raise
+                shutil.copyfileobj(fsrc, fdst, self._READ_CHUNK_SIZE)
                 
-        return {"output": "\n".join(results), "error": "", "exit_code": 0}
+        shutil.copystat(src, dst)
+        return dst
+    
+    def _map_file(self, f):
+        """Map an open binary file read-only
+        
+        Small or unmappable files (pipes, procfs) are read into bytes instead;
+        either result supports the same find/slice operations.
+        """
+        try:
+            if os.fstat(f.fileno()).st_size >= self._MMAP_THRESHOLD:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            pass
+        return f.read()
+    
+    def _open_text(self, path: str):
+        """Open a file as UTF-8 text, one read() syscall per _READ_CHUNK_SIZE
+        
+        The default 8 KiB buffer makes TextIOWrapper issue a syscall for every
+        8 KiB decoded; a larger buffer cuts that by two orders of magnitude
+        on big files.
+        """
+        return open(path, 'r', encoding='utf-8', errors='replace', buffering=self._READ_CHUNK_SIZE)
+    
+    def _decode_text(self, data: bytes) -> str:
+        """Decode file bytes the way open(..., 'r') would, with universal newlines"""
+        return data.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+    
+    def _count_newlines(self, buf, start: int, end: int) -> int:
+        """Count newlines in buf[start:end], copying at most one chunk at a time
+        
+        bytes (and mmap on Pythons whose mmap has count()) are counted in
+        place; older mmap objects need the chunked slices.
+        """
+        if hasattr(buf, 'count'):
+            return buf.count(b'\n', start, end)
+            
+        count = 0
+        for offset in range(start, end, self._READ_CHUNK_SIZE):
+            count += buf[offset:min(offset + self._READ_CHUNK_SIZE, end)].count(b'\n')
+        return count
+    
+    def _scan_tree(self, root: str, stat_files: bool = False):
+        """Scan the directory tree under root
+        
+        Yields (directory, files, dirs) lists of DirEntry for every readable
+        directory. Like os.walk, symlinked directories are reported but not
+        descended into. With stat_files, each file's lstat() is fetched
+        during the scan and cached on its DirEntry.
+        
+        Directories are listed one at a time, which is fastest while the
+        listings come from the page cache: a thread pool only adds overhead
+        there. If the first _WALK_PROBE_DIRS listings average more than
+        _SLOW_LISTING_SECONDS, the syscalls are blocking on storage, so the
+        rest of the tree is listed on a pool where those waits overlap; the
+        order is then not deterministic.
+        """
+        def scan(directory):
+            files = []
+            dirs = []
+            subdirs = []
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                        
+                    if is_dir:
+                        dirs.append(entry)
+                        try:
+                            if not entry.is_symlink():
+                                subdirs.append(entry.path)
+                        except OSError:
+                            pass
+                    else:
+                        files.append(entry)
+                        if stat_files:
+                            try:
+                                entry.stat(follow_symlinks=False)
+                            except OSError:
+                                pass
+            return directory, files, dirs, subdirs
+        
+        pending = [root]
+        scanned = 0
+        listing_time = 0.0
+        while pending:
+            if scanned == self._WALK_PROBE_DIRS and listing_time > scanned * self._SLOW_LISTING_SECONDS:
+                break
+            scanned += 1
+            started = time.perf_counter()
+            try:
+                directory, files, dirs, subdirs = scan(pending.pop())
+            except OSError:
+                continue
+            finally:
+                listing_time += time.perf_counter() - started
+            pending.extend(subdirs)
+            yield directory, files, dirs
+            
+        if not pending:
+            return
+            
+        with ThreadPoolExecutor(max_workers=self._WALK_WORKERS) as executor:
+            futures = {executor.submit(scan, directory) for directory in pending}
+            while futures:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        directory, files, dirs, subdirs = future.result()
+                    except OSError:
+                        continue
+                    for subdir in subdirs:
+                        futures.add(executor.submit(scan, subdir))
+                    yield directory, files, dirs
+    
+    def _bulk_stat(self, entries: List[os.DirEntry]) -> None:
+        """Fill the stat() cache of a batch of DirEntry objects
+        
+        Large batches are split into one slice per worker thread so the
+        stat syscalls overlap; errors are left for the caller's own stat().
+        """
+        def stat_slice(batch):
+            for entry in batch:
+                try:
+                    entry.stat()
+                except OSError:
+                    pass
+        
+        if len(entries) < self._BULK_STAT_THRESHOLD:
+            return
+        
+        step = -(-len(entries) // self._WALK_WORKERS)
+        with ThreadPoolExecutor(max_workers=self._WALK_WORKERS) as executor:
+            list(executor.map(stat_slice, (entries[i:i + step] for i in range(0, len(entries), step))))
+    
+    def _start_shell(self) -> "subprocess.Popen":
+        """Launch the persistent shell with the current environment"""
+        import subprocess
+        self._shell_env = dict(self.environment_vars)
+        self._shell_marker = f"__CODEMATE_END_{os.urandom(8).hex()}__"
+        # Own session so a timed-out command can be killed with its children
+        self._shell = subprocess.Popen(
+            ['/bin/sh'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.current_dir,
+            env=self._shell_env,
+            bufsize=0,
+            start_new_session=True
+        )
+        return self._shell
+    
+    def _stop_shell(self) -> None:
+        """Kill the persistent shell and everything it started"""
+        shell, self._shell = self._shell, None
+        if shell is None:
+            return
+        try:
+            os.killpg(shell.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        shell.wait()
+        shell.stdin.close()
+        shell.stdout.close()
+        shell.stderr.close()
+    
+    def _run_in_shell(self, command_line: str) -> Dict[str, Any]:
+        """Run a command in the persistent shell, reading output up to a sentinel
+        
+        Each command runs in a subshell cd'd to the current directory, so cd,
+        exit or variable assignments do not leak into the next command, and
+        eval keeps a syntax error from taking the shell down with it. Only one
+        command is in flight at a time.
+        """
+        with self._shell_lock:
+            return self._shell_round_trip(command_line)
+    
+    def _shell_round_trip(self, command_line: str) -> Dict[str, Any]:
+        """Send one command to the persistent shell and collect its result"""
+        shell = self._shell
+        if shell is None or shell.poll() is not None or self._shell_env != self.environment_vars:
+            self._stop_shell()
+            shell = self._start_shell()
+            
+        marker = self._shell_marker
+        script = (
+            f"( cd -- {shlex.quote(self.current_dir)} && eval {shlex.quote(command_line)} ) </dev/null; "
+            f"printf '\\n{marker}:%d\\n' $?; printf '\\n{marker}\\n' >&2\n"
+        )
+        try:
+            shell.stdin.write(script.encode('utf-8'))
+        except OSError:
+            self._stop_shell()
+            raise
+            
+        out_end = f"\n{marker}:".encode('ascii')
+        err_end = f"\n{marker}\n".encode('ascii')
+        out, err = bytearray(), bytearray()
+        out_fd, err_fd = shell.stdout.fileno(), shell.stderr.fileno()
+        pending = [out_fd, err_fd]
+        exit_code = None
+        deadline = time.monotonic() + self._SYSTEM_COMMAND_TIMEOUT
+        while pending:
+            remaining = deadline - time.monotonic()
+            ready = select.select(pending, [], [], remaining)[0] if remaining > 0 else []
+            if not ready:
+                self._stop_shell()
+                return {"output": "", "error": "Command timed out", "exit_code": 124}
+                
+            for fd in ready:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    # The shell itself died; report what it managed to write
+                    self._stop_shell()
+                    return {"output": self._decode_text(out), "error": self._decode_text(err), "exit_code": 1}
+                    
+                if fd == out_fd:
+                    out += chunk
+                    # The sentinel line is the marker, the exit status and a newline
+                    pos = out.rfind(out_end, max(0, len(out) - len(out_end) - 16))
+                    if pos != -1 and out.endswith(b'\n'):
+                        exit_code = int(out[pos + len(out_end):-1])
+                        del out[pos:]
+                        pending.remove(fd)
+                else:
+                    err += chunk
+                    if err.endswith(err_end):
+                        del err[-len(err_end):]
+                        pending.remove(fd)
+                        
+        return {
+            "output": self._decode_text(out),
+            "error": self._decode_text(err),
+            "exit_code": exit_code
+        }
     
     def _execute_system_command(self, command_line: str) -> Dict[str, Any]:
         """Execute system command"""
+        import subprocess
         try:
+            # A shell kept alive between commands saves a fork/exec of /bin/sh
+            # per command; cmd.exe has no comparable scripting interface.
+            # Background jobs would keep the shared pipes open and write into
+            # later commands' results, so lines that start one get their own
+            # shell, which (as before) waits until the job closes its output
+            if os.name == 'posix' and not _BACKGROUND_RE.search(command_line):
+                return self._run_in_shell(command_line)
+                
             result = subprocess.run(
                 command_line,
                 shell=True,
                 cwd=self.current_dir,
                 capture_output=True,
                 text=True,
-                timeout=30,
+                timeout=self._SYSTEM_COMMAND_TIMEOUT,
                 env=self.environment_vars
             )
             
@@ -953,56 +1660,109 @@ Aliases and Variables:
         except Exception as e:
             return {"output": "", "error": f"Command not found: {str(e)}", "exit_code": 127}
     
+    @staticmethod
+    def _shorten_dir(path: str) -> str:
+        """Directory as shown in the prompt"""
+        # Shorten path if too long
+        if len(path) > 30:
+            path = "..." + path[-27:]
+        return path
+    
     def get_prompt(self) -> str:
         """Generate command prompt"""
-        user = os.getenv('USER', os.getenv('USERNAME', 'user'))
-        hostname = platform.node()
-        current_dir = self.current_dir
+        return f"{self._user}@{self._hostname}:{self._display_dir}$ "
+    
+    def _directory_names(self, directory: str) -> Tuple[str, ...]:
+        """Entry names of directory, reused while its mtime is unchanged
         
-        # Shorten path if too long
-        if len(current_dir) > 30:
-            current_dir = "..." + current_dir[-27:]
+        Creating, removing or renaming an entry updates the directory's
+        mtime, so repeated completions in one place list it only once.
+        """
+        mtime = os.stat(directory).st_mtime_ns
+        cache = self._listing_cache
+        if cache is not None and cache[0] == directory and cache[1] == mtime:
+            return cache[2]
             
-        return f"{user}@{hostname}:{current_dir}$ "
+        with os.scandir(directory) as it:
+            names = tuple(sorted(entry.name for entry in it))
+        self._listing_cache = (directory, mtime, names)
+        return names
     
     def get_command_suggestions(self, partial_command: str) -> List[str]:
         """Get command auto-completion suggestions"""
-        builtin_commands = [
-            'cd', 'pwd', 'ls', 'dir', 'mkdir', 'rmdir', 'rm', 'del', 'touch',
-            'cat', 'type', 'cp', 'copy', 'mv', 'move', 'find', 'ps', 'kill',
-            'top', 'df', 'du', 'whoami', 'date', 'echo', 'env', 'set', 'export',
-            'history', 'clear', 'cls', 'help', 'alias', 'unalias', 'which',
-            'where', 'tree', 'wc', 'head', 'tail', 'grep', 'findstr'
-        ]
-        
-        suggestions = []
-        
-        # Built-in command suggestions
-        for cmd in builtin_commands:
-            if cmd.startswith(partial_command.lower()):
-                suggestions.append(cmd)
+        partial = partial_command.lower()
         
-        # Alias suggestions
-        for alias in self.aliases.keys():
-            if alias.startswith(partial_command.lower()):
-                suggestions.append(alias)
+        # Built-in command and alias suggestions, each a run of a sorted sequence
+        if self._aliases_sorted is None:
+            self._aliases_sorted = sorted(self.aliases)
+        builtins = _with_prefix(self._BUILTINS_SORTED, partial)
+        aliases = _with_prefix(self._aliases_sorted, partial)
         
-        # File/directory suggestions for the current directory
-        if partial_command and not any(partial_command.startswith(cmd) for cmd in builtin_commands):
+        # File/directory suggestions for the current directory, unless the
+        # input already starts with a builtin name
+        files = ()
+        if partial_command and not any(partial_command[:i] in self._BUILTINS for i in range(1, len(partial_command) + 1)):
             try:
-                for item in os.listdir(self.current_dir):
-                    if item.startswith(partial_command):
-                        suggestions.append(item)
+                files = _with_prefix(self._directory_names(self.current_dir), partial_command)
             except OSError:
                 pass
         
-        return sorted(suggestions)
+        # All three streams are already sorted, so merging them gives the
+        # first suggestions in order without sorting the lot
+        return list(islice(heapq.merge(builtins, aliases, files), self._SUGGESTION_LIMIT))
 
 
 # CLI Interface
 class CLIInterface:
+    # Where readline keeps command history between sessions
+    HISTORY_FILE = os.path.join(os.path.expanduser("~"), ".python_terminal_history")
+    
     def __init__(self):
         self.terminal = PythonTerminal()
+        # Completions for the word being completed, computed on the first tab press
+        self._matches = []
+        self._setup_readline()
+        
+    def _setup_readline(self):
+        """Hook tab completion and persistent history into input(), where available
+        
+        readline is missing on Windows unless pyreadline3 is installed, in
+        which case input() simply works without completion.
+        """
+        try:
+            import readline
+        except ImportError:
+            return
+            
+        readline.set_completer(self._complete)
+        # Hand the completer whole shell words; the default delimiters split
+        # on - / = $ and the like, so my-fi would be completed as just fi
+        readline.set_completer_delims(' \t\n')
+        if 'libedit' in (readline.__doc__ or ''):
+            # macOS ships libedit in place of GNU readline
+            readline.parse_and_bind("bind ^I rl_complete")
+        else:
+            readline.parse_and_bind("tab: complete")
+            
+        readline.set_history_length(PythonTerminal._HISTORY_SIZE)
+        try:
+            readline.read_history_file(self.HISTORY_FILE)
+        except OSError:
+            pass
+        atexit.register(self._save_history, readline)
+        
+    def _save_history(self, readline):
+        """Write the readline history back out on exit"""
+        try:
+            readline.write_history_file(self.HISTORY_FILE)
+        except OSError:
+            pass
+        
+    def _complete(self, text: str, state: int) -> Optional[str]:
+        """readline completer; readline asks for match 0, 1, 2... until None"""
+        if state == 0:
+            self._matches = self.terminal.get_command_suggestions(text)
+        return self._matches[state] if state < len(self._matches) else None
         
     def run(self):
         """Run the CLI interface"""
@@ -1010,6 +1770,11 @@ class CLIInterface:
         print("Type 'help' for available commands, 'exit' to quit.")
         print()
         
+        write_out = sys.stdout.write
+        write_err = sys.stderr.write
+        # Clearing with an escape sequence avoids spawning clear(1) on POSIX
+        clear_screen = os.name != 'nt'
+        
         try:
             while True:
                 try:
@@ -1025,12 +1790,17 @@ class CLIInterface:
                         
                         if result['output']:
                             if result['output'] == 'CLEAR_SCREEN':
-                                os.system('cls' if platform.system() == 'Windows' else 'clear')
+                                if clear_screen:
+                                    write_out("\x1b[2J\x1b[H")
+                                else:
+                                    os.system('cls')
                             else:
-                                print(result['output'])
+                                write_out(result['output'])
+                                write_out("\n")
+                            sys.stdout.flush()
                         
                         if result['error']:
-                            print(f"Error: {result['error']}", file=sys.stderr)
+                            write_err(f"Error: {result['error']}\n")
                             
                 except KeyboardInterrupt:
                     print("\n^C")